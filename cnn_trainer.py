@@ -45,6 +45,12 @@ class CNNTrainer:
         self.train_dir = train_dir
         os.makedirs(self.train_dir, exist_ok=True)
 
+        # Conv inputs come in few distinct shapes (fixed training batches, eval_batchsize chunks in predict_volume)
+        # so let cuDNN pick the fastest conv algorithms per shape, and use TF32 on Ampere+
+        torch.backends.cudnn.benchmark = True
+        torch.backends.cuda.matmul.allow_tf32 = True
+        torch.backends.cudnn.allow_tf32 = True
+
         model.to(self.config.device)
         model.train()
 
@@ -53,9 +59,9 @@ class CNNTrainer:
         logging.info('Training..')
         start = time()
         for sample in iterate_dataloader(train_loader):
-            ct_volume = sample['ct'].to(device=self.config.device, dtype=torch.float32)
-            gt_volume = sample['gt'].to(device=self.config.device, dtype=torch.long)
-            mask_volume = sample['mask'].to(device=self.config.device, dtype=torch.bool)
+            ct_volume = sample['ct'].to(device=self.config.device, non_blocking=True).float()
+            gt_volume = sample['gt'].to(device=self.config.device, non_blocking=True).long()
+            mask_volume = sample['mask'].to(device=self.config.device, non_blocking=True).bool()
 
             loss = model.train_one_sample(ct_volume, gt_volume, mask_volume, self.volume_crieteria)
 
@@ -62,7 +62,11 @@ class SliceVolume(object):
 class Znormalization:
     def __call__(self, sample):
         image, segmap = sample
-        image = (image - image.mean()) / image.std()
+        # Normalize in float32 rather than the float64 numpy promotes int16 volumes to.
+        # astype already returns a new array so the normalization is done in place on it
+        image = image.astype(np.float32)
+        image -= image.mean()
+        image /= image.std()
         return image, segmap
 
 
@@ -135,8 +139,10 @@ def get_dataloaders(data_config):
     """
     train_set, val_set = get_datasets(data_config)
 
-    train_loader = DataLoader(train_set, shuffle=True, batch_size=data_config.batch_size, num_workers=data_config.num_workers)
-    val_loader = DataLoader(val_set, shuffle=True, batch_size=1, num_workers=data_config.num_workers)
+    # Pinned host memory allows asynchronous (non_blocking) copies to the GPU
+    pin_memory = torch.cuda.is_available()
+    train_loader = DataLoader(train_set, shuffle=True, batch_size=data_config.batch_size, num_workers=data_config.num_workers, pin_memory=pin_memory)
+    val_loader = DataLoader(val_set, shuffle=True, batch_size=1, num_workers=data_config.num_workers, pin_memory=pin_memory)
 
     return train_loader, val_loader
 
@@ -156,7 +162,7 @@ class CTDataset(Dataset):
         self.case_names = []
         n_slices = []
         for ct_path, seg_path in data_paths:
-            self.segs.append(read_volume(seg_path).astype(np.uint8))
+            self.segs.append(read_volume(seg_path).astype(np.uint8, copy=False))
             self.cts.append(read_volume(ct_path))
             self.case_names.append(os.path.splitext(os.path.basename(ct_path))[0])
             n_slices.append(self.cts[-1].shape[-3])
@@ -1,17 +1,21 @@
 import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
 import numpy as np
-from scipy import ndimage
 from tqdm import tqdm
 import SimpleITK as sitk
 import sys
 
-def get_LiTS2017_paths(data_root):
-    ct_files = sorted(os.listdir(os.path.join(data_root, 'ct')))
-    segmentation_files = sorted(os.listdir(os.path.join(data_root, 'seg')))
+# A single resample filter per process that is reconfigured for every volume. Filters copy SimpleITK's global
+# settings (e.g. number of threads) when created, so it is created lazily inside the process that uses it
+RESAMPLERS = dict()
 
-    ct_files = [os.path.join(data_root, 'ct', x) for x in ct_files]
-    segmentation_files = [os.path.join(data_root, 'seg', x) for x in segmentation_files]
+
+def get_LiTS2017_paths(data_root):
+    ct_files = sorted([entry.path for entry in os.scandir(os.path.join(data_root, 'ct'))])
+    segmentation_files = sorted([entry.path for entry in os.scandir(os.path.join(data_root, 'seg'))])
 
     data_paths = list(zip(ct_files, segmentation_files))
 
@@ -25,13 +29,81 @@ def get_KiTS2019_paths(data_root):
     ]
 
 
-def create_dataset(data_paths, crop_padding=(3,10,10), normalize_axial_mm=None, spatal_resize=1.0):
+def get_crop_around_mask(mask, padding):
+    """
+    Return the slices of the bounding box of the non-zero voxels of a 3d mask, padded by padding in each dimension
+    """
+    # Reduce to per-axis occupancy profiles instead of collecting the indices of every non-zero voxel
+    yx_any = mask.any(axis=0)
+    profiles = [mask.any(axis=(1, 2)), yx_any.any(axis=1), yx_any.any(axis=0)]
+    crop = []
+    for i, profile in enumerate(profiles):
+        nonzero = np.flatnonzero(profile)
+        crop.append(slice(max(0, int(nonzero[0]) - padding[i]), int(nonzero[-1]) + padding[i]))
+    return tuple(crop)
+
+
+def resample_volume(image, new_spacing, interpolator):
+    """
+    Resample a sitk image to a new spacing while keeping its origin, direction and pixel type.
+    The output grid is anchored at the origin with round(size * spacing / new_spacing) voxels per axis, so it may end
+    slightly before or after the last input voxel; output voxels past it are filled from the edge.
+    """
+    new_size = [int(round(size * sp / new_sp)) for size, sp, new_sp in zip(image.GetSize(), image.GetSpacing(), new_spacing)]
+    if os.getpid() not in RESAMPLERS:
+        RESAMPLERS[os.getpid()] = sitk.ResampleImageFilter()
+    resampler = RESAMPLERS[os.getpid()]
+    resampler.SetOutputSpacing(new_spacing)
+    resampler.SetSize(new_size)
+    resampler.SetOutputDirection(image.GetDirection())
+    resampler.SetOutputOrigin(image.GetOrigin())
+    resampler.SetInterpolator(interpolator)
+    # Output voxels past the input's last slice take the edge value instead of 0 (e.g. not a fake 0 HU slice)
+    resampler.SetUseNearestNeighborExtrapolator(True)
+    return resampler.Execute(image)
+
+
+def preprocess_case(case_paths, crop_padding, normalize_axial_mm, spatal_resize):
+    """
+    Crop and resample a single CT and its segmentation and write them into the new dataset
+    param: case_paths: tuple of (ct path, segmentation path, output ct path, output segmentation path)
+    """
+    ct_filepath, gt_fname, new_ct_path, new_seg_path = case_paths
+    # Read data
+    ct = sitk.ReadImage(ct_filepath, sitk.sitkInt16)
+    seg = sitk.ReadImage(gt_fname, sitk.sitkUInt8)
+    assert (seg.GetSize() == ct.GetSize())
+
+    if crop_padding is not None:
+        # Crop around liver for tumor segmentaiton
+        liver_crop = get_crop_around_mask(sitk.GetArrayViewFromImage(seg), crop_padding)
+        # sitk images are indexed in (x, y, z) order
+        ct = ct[liver_crop[::-1]]
+        seg = seg[liver_crop[::-1]]
+
+    # Resample (once, after cropping, and only if the spacing actually changes)
+    spacing = ct.GetSpacing()
+    spatial_scale = min(spatal_resize, 1.0)
+    new_spacing = (spacing[0] / spatial_scale, spacing[1] / spatial_scale,
+                   normalize_axial_mm if normalize_axial_mm is not None else spacing[2])
+    if not np.allclose(new_spacing, spacing):
+        ct = resample_volume(ct, new_spacing, sitk.sitkBSpline)
+        seg = resample_volume(seg, new_spacing, sitk.sitkNearestNeighbor)
+
+    # Finally save data
+    sitk.WriteImage(ct, new_ct_path)
+    sitk.WriteImage(seg, new_seg_path)
+
+
+def create_dataset(data_paths, crop_padding=(3,10,10), normalize_axial_mm=None, spatal_resize=1.0, num_workers=None):
     """"
     Create a dataset of 3d crops of tumors with margins
     param: crop_params: optional parameters for cropped version of the data
     param: min_sizes: minimal dimensions for a volume
     param: spatial_scale: spatial scale factor
     #### param: slice_size_mm: down/up sample in z dimension to normalize the real world size between CT slices to number of mm
+    param: num_workers: number of processes used to preprocess cases in parallel (defaults to the number of CPUs).
+                        Each worker holds a whole volume and its resampling buffers, so peak memory grows with this number
 
     """
     processed_dir = f"LiTS2017" + (f"_C-{crop_padding}" if crop_padding is not None else "") + \
@@ -44,42 +116,16 @@ def create_dataset(data_paths, crop_padding=(3,10,10), normalize_axial_mm=None,
     os.makedirs(new_ct_dir, exist_ok=True)
     os.makedirs(new_seg_dir, exist_ok=True)
 
-    for ct_filepath, gt_fname in tqdm(data_paths):
-        # Read data
-        ct = sitk.ReadImage(ct_filepath, sitk.sitkInt16)
-        ct_array = sitk.GetArrayFromImage(ct)
-        seg = sitk.ReadImage(gt_fname, sitk.sitkInt8)
-        seg_array = sitk.GetArrayFromImage(seg)
-        assert (seg_array.shape == ct_array.shape)
-
-        if crop_padding is not None:
-            # Crop around liver for tumor segmentaiton
-            nwhere = np.where(seg_array != 0)
-            liver_crop = tuple([slice(max(0, x.min() - crop_padding[i]), x.max() + crop_padding[i]) for i, x in enumerate(nwhere)])
-            ct_array = ct_array[liver_crop]
-            seg_array = seg_array[liver_crop]
-
-        # Resample
-        if normalize_axial_mm is not None:
-            new_dims = (ct.GetSpacing()[-1] / normalize_axial_mm, 1, 1)
-            ct_array = ndimage.zoom(ct_array, new_dims, order=3)
-            seg_array = ndimage.zoom(seg_array, new_dims, order=0)
-
-        if spatal_resize < 1:
-            new_dims = (1, spatal_resize, spatal_resize)
-            ct_array = ndimage.zoom(ct_array, new_dims, order=3)
-            seg_array = ndimage.zoom(seg_array, new_dims, order=0)
-
-        # Finally save data
+    jobs = []
+    for ct_filepath, gt_fname in data_paths:
         fname = os.path.basename(ct_filepath)
+        jobs.append((ct_filepath, gt_fname, os.path.join(new_ct_dir, fname), os.path.join(new_seg_dir, fname.replace('volume', 'segmentation'))))
 
-        new_ct = sitk.GetImageFromArray(ct_array)
-        new_ct.SetSpacing(ct.GetSpacing())
-        sitk.WriteImage(new_ct, os.path.join(new_ct_dir, fname))
-
-        new_seg = sitk.GetImageFromArray(seg_array.astype(np.uint8))
-        new_seg.SetSpacing(ct.GetSpacing())
-        sitk.WriteImage(new_seg, os.path.join(new_seg_dir, fname).replace(f'volume', f'segmentation'))
+    process_case = partial(preprocess_case, crop_padding=crop_padding, normalize_axial_mm=normalize_axial_mm, spatal_resize=spatal_resize)
+    # Cases are independent: read, crop, resample and write each one in its own process.
+    # Parallelism comes from the pool, so each worker's SimpleITK filters run single threaded
+    with ProcessPoolExecutor(max_workers=num_workers, initializer=sitk.ProcessObject.SetGlobalDefaultNumberOfThreads, initargs=(1,)) as executor:
+        list(tqdm(executor.map(process_case, jobs), total=len(jobs)))
 
     print("Done")
 
@@ -1,7 +1,6 @@
 import os
 from time import time
 
-import numpy as np
 import torch
 
 from datasets.visualize_data import write_volume_slices
@@ -11,13 +10,14 @@ from metrics import compute_segmentation_score, TverskyScore, compute_IOU
 def evaluate(model, dataloader, device, volume_crieteria, outputs_dir=None):
     model.eval()
     with torch.no_grad():
-        dice_scores = []
-        loss_values = []
+        # Keep per-case results on the device and copy them back once at the end
+        dice_scores = torch.empty(len(dataloader.dataset), model.n_classes, device=device)
+        loss_values = torch.empty(len(dataloader.dataset), device=device)
         # iterate over the validation set
         for b_idx, sample in enumerate(dataloader):
-            ct_volume = sample['ct'].to(device=device, dtype=torch.float32)
-            gt_volume = sample['gt'].to(device=device, dtype=torch.long)
-            mask_volume = sample['mask'].to(device=device, dtype=torch.bool)
+            ct_volume = sample['ct'].to(device=device, non_blocking=True).float()
+            gt_volume = sample['gt'].to(device=device, non_blocking=True).long()
+            mask_volume = sample['mask'].to(device=device, non_blocking=True).bool()
             assert(ct_volume.shape[0] == 1)
             case_name = sample['case_name'][0]
 
@@ -25,20 +25,20 @@ def evaluate(model, dataloader, device, volume_crieteria, outputs_dir=None):
 
             dice_per_class = compute_segmentation_score(TverskyScore(0.5, 0.5), pred_volume, gt_volume.unsqueeze(1), mask_volume.unsqueeze(1), return_per_class=True)
             loss = volume_crieteria(pred_volume, gt_volume, mask_volume)
-            dice_scores.append(dice_per_class)
-            loss_values.append(loss.item())
+            dice_scores[b_idx] = dice_per_class
+            loss_values[b_idx] = loss
 
             # plot volume
             if outputs_dir is not None:
                 dir_path = os.path.join(outputs_dir, f"Case-{case_name}_Dice-{[f'{x:.3f}' for x in dice_per_class]}")
                 write_volume_slices(ct_volume[0].cpu(), [pred_volume.argmax(dim=1)[0].cpu(), gt_volume[0].cpu()], dir_path)
 
-        dice_scores = torch.stack(dice_scores).mean(0)
+        dice_scores = dice_scores.mean(0).cpu()
         report = dict()
         for i in range(1, len(dice_scores)):
             report[f'Dice-class-{i}'] = dice_scores[i]
 
-        report["Loss"] = np.mean(loss_values)
+        report["Loss"] = loss_values.mean().item()
         model.train()
         return report
 
@@ -6,13 +6,13 @@ import numpy as np
 import torch
 import SimpleITK as sitk
 from torchvision.transforms import InterpolationMode
-from scipy import ndimage
 import torch.nn.functional as F
 import cc3d
 from scipy.ndimage.morphology import binary_opening, binary_dilation, binary_erosion
 
 from config import ExperimentConfigs
 from datasets.ct_dataset import get_transforms, LITS2017_VALSETS
+from datasets.preprocess_data import get_crop_around_mask, resample_volume
 from datasets.visualize_data import write_volume_slices
 from models import get_model
 from torchvision.transforms import Resize
@@ -46,11 +46,15 @@ def clean_liver_prediction(pred_volume):
         return torch.from_numpy(binary_mask)
     # Find 3D blobs
     cc = cc3d.connected_components(binary_mask)
-    clean_pred_volume = max([image for (label, image) in cc3d.each(cc, binary=True, in_place=False)],
-                            key=lambda x: x.sum())
+    stats = cc3d.statistics(cc)
+    blob_sizes = stats['voxel_counts']
+    blob_sizes[0] = 0  # ignore background
+    label = blob_sizes.argmax()
 
-    # Restore blob to original
-    clean_pred_volume = binary_dilation(clean_pred_volume, iterations=5)
+    # Restore blob to original: the dilation can't grow more than 5 voxels so only dilate around the blob
+    box = tuple([slice(max(0, x.start - 5), x.stop + 5) for x in stats['bounding_boxes'][label]])
+    clean_pred_volume = np.zeros_like(binary_mask)
+    clean_pred_volume[box] = binary_dilation(cc[box] == label, iterations=5)
 
     clean_pred_volume = torch.from_numpy(clean_pred_volume)
 
@@ -131,12 +135,14 @@ def inference(ct_path, gt_path, liver_localization_model_dir, multiclass_segment
             predicted_liver_mask = Resize(ct_volume.shape[-2:], interpolation=InterpolationMode.NEAREST)(predicted_liver_mask)       # shape (S, 512, 512)
 
             # Crop around liver for tumor segmentaiton                                                                           # shape (S, h, w)
-            nwhere = np.where(predicted_liver_mask)
-            liver_crop = tuple([slice(max(0, x.min() - liver_crop_padding[i]), x.max() + liver_crop_padding[i]) for i, x in enumerate(nwhere)])
+            liver_crop = get_crop_around_mask(predicted_liver_mask.numpy(), liver_crop_padding)
             cropped_ct = ct_volume[liver_crop]                                                                                      # shape (S, h, w)
 
             if normalized_mms is not None:
-                cropped_ct = ndimage.zoom(cropped_ct, (spacing[-1] / normalized_mms, 1, 1), order=3)
+                cropped_image = sitk.GetImageFromArray(cropped_ct)
+                cropped_image.SetSpacing(spacing)
+                cropped_image = resample_volume(cropped_image, (spacing[0], spacing[1], normalized_mms), sitk.sitkBSpline)
+                cropped_ct = sitk.GetArrayFromImage(cropped_image)
 
             multiclass_mask = segmentor.predict(cropped_ct)
 
@@ -164,7 +170,8 @@ def inference(ct_path, gt_path, liver_localization_model_dir, multiclass_segment
 
                 # dump debug images
                 if dump_debug_images:
-                    ct_volume = torch.from_numpy(np.clip(ct_volume, -100, 400).astype(float))
+                    np.clip(ct_volume, -100, 400, out=ct_volume)  # ct_volume is not used after this point
+                    ct_volume = torch.from_numpy(ct_volume.astype(float))
                     write_volume_slices(ct_volume, [final_mask, gt_volume], os.path.join(outputs_dir, f"{os.path.splitext(fname)[0]}_{liver_score.item():.2f}_{tumor_score.item():.2f}"))
 
                 print(f"AVG Dice per case: Liver: {np.mean(liver_dice_scores)}, Tumor: {np.mean(tumor_dice_scores)}, Tumor-Recall: {np.mean(tumor_recalls)}")
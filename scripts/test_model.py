@@ -18,6 +18,12 @@ def test(train_data_root, model_dir, ckpt_name='best', dump_debug_images=False):
     """
     ckpt = torch.load(f'{model_dir}/{ckpt_name}.pth')
 
+    # predict_volume feeds eval_batchsize chunks so only the last chunk's shape varies; as in training let cuDNN
+    # pick the fastest conv algorithms per shape, and use TF32 on Ampere+
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
     config = ExperimentConfigs(**json.load(open(f"{model_dir}/exp_configs.json")))
     config.data_path = train_data_root
 
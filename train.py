@@ -40,7 +40,7 @@ def run_multiple_experiments(outputs_dir):
     os.makedirs(outputs_dir, exist_ok=True)
     logging.basicConfig(filename=os.path.join(outputs_dir, 'log-file.log'), format='%(asctime)s:%(message)s', level=logging.INFO, datefmt='%m-%d %H:%M:%S')
 
-    full_report = pd.DataFrame()
+    experiment_reports = []
     common_kwargs = dict(starting_lr=0.00001, num_workers=4, val_set='A', train_steps=100000,
                       dice_loss_weight=0, wce_loss_weight=0, ce_loss_weight=1,
                       augment_data=True, elastic_deformations=False, force_non_empty=0.5)
@@ -55,9 +55,9 @@ def run_multiple_experiments(outputs_dir):
         experiment_report['Model_name'] = str(exp_config)
         experiment_report['N_slices'] = exp_config.train_steps * exp_config.batch_size * exp_config.slice_size
 
-        full_report = full_report.append(experiment_report, ignore_index=True)
+        experiment_reports.append(experiment_report)
 
-    full_report = full_report.set_index('Model_name')
+    full_report = pd.DataFrame(experiment_reports).set_index('Model_name')
     full_report.to_csv(os.path.join(outputs_dir, f"Final-report.csv"), sep=',')
 
 